@@ -3,8 +3,13 @@ import pandas as pd
 import numpy as np
 import matplotlib.pyplot as plt
 import seaborn as sns
-import sqlite3
-from datetime import datetime
+import os
+import tempfile
+from datetime import datetime, timedelta
+import pyarrow as pa
+import pyarrow.csv as pcsv
+import pyarrow.parquet as pq
+import polars as pl
 import plotly.express as px
 import plotly.graph_objects as go
 from plotly.subplots import make_subplots
@@ -44,178 +49,338 @@ st.markdown("""
 </style>
 """, unsafe_allow_html=True)
 
-@st.cache_data
-def load_and_process_data():
-    """Load and process the CSV file from repository"""
+CSV_PATH = 'credit_card_data.csv'
+PARQUET_PATH = 'credit_card_data.parquet'
+PARQUET_COLUMNS = ['date', 'amount', 'city', 'card_type', 'exp_type', 'gender']
+PARQUET_ROW_GROUP_BYTES = 128 * 1024 * 1024
+CSV_DATE_FORMATS = [pcsv.ISO8601, '%d-%b-%y']
+CATEGORICAL_COLUMNS = ['city', 'card_type', 'exp_type', 'gender']
+TIER1_CITIES = ['Greater Mumbai, India', 'Delhi, India', 'Bengaluru, India', 'Ahmedabad, India']
+CITY_TIERS = ['Tier-1', 'Tier-2/3']
+DAY_NAMES = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
+SEGMENTS = ['Champions', 'Loyal Groups', 'At Risk', 'Lost Groups', 'Potential Loyalists']
+MONTH_NAMES = ['January', 'February', 'March', 'April', 'May', 'June', 'July',
+               'August', 'September', 'October', 'November', 'December']
+SPENDING_TIER_EDGES = [1000, 5000, 15000]
+SPENDING_TIER_LABELS = ['Low (₹0-1K)', 'Medium (₹1K-5K)', 'High (₹5K-15K)', 'Premium (₹15K+)']
+
+def read_raw_csv():
+    """Parse the CSV with pyarrow's multithreaded reader, typing dates and amounts at parse time"""
+    table = pcsv.read_csv(
+        CSV_PATH,
+        convert_options=pcsv.ConvertOptions(timestamp_parsers=CSV_DATE_FORMATS)
+    )
+    return table.to_pandas(coerce_temporal_nanoseconds=True)
+
+def clean_raw_data(df):
+    """Standardize and clean the raw CSV columns"""
+    # Standardize column names
+    df.columns = df.columns.str.strip().str.lower().str.replace(' ', '_')
+    
+    # Data cleaning (conversions are no-ops for columns already typed by the reader)
+    df = df.dropna(subset=['amount', 'date'])
+    df['date'] = pd.to_datetime(df['date'], errors='coerce')
+    df = df.dropna(subset=['date'])
+    df['amount'] = pd.to_numeric(df['amount'], errors='coerce')
+    df = df[df['amount'] > 0]
+    
+    # Standardize text fields
+    text_columns = ['city', 'card_type', 'exp_type', 'gender']
+    for col in text_columns:
+        if col in df.columns:
+            df[col] = df[col].astype(str).str.title().str.strip()
+    
+    return df
+
+def ensure_parquet():
+    """Convert the CSV to a cleaned, typed Parquet file once and return its path"""
+    if os.path.exists(PARQUET_PATH) and (
+        not os.path.exists(CSV_PATH) or os.path.getmtime(PARQUET_PATH) >= os.path.getmtime(CSV_PATH)
+    ):
+        return PARQUET_PATH
+    
+    df = clean_raw_data(read_raw_csv())
+    table = pa.Table.from_pandas(df[PARQUET_COLUMNS], preserve_index=False)
+    
+    # pyarrow sizes row groups in rows, so translate the ~128 MB target
+    bytes_per_row = max(table.nbytes // max(table.num_rows, 1), 1)
+    
+    # Write next to the target and swap it in atomically, so an interrupted
+    # write never leaves a truncated file that looks newer than the CSV
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(PARQUET_PATH)),
+                                    prefix='credit_card_data.', suffix='.parquet.tmp')
+    os.close(fd)
     try:
-        df = pd.read_csv('credit_card_data.csv')
-        
-        # Standardize column names
-        df.columns = df.columns.str.strip().str.lower().str.replace(' ', '_')
-        
-        # Data cleaning
-        df = df.dropna(subset=['amount', 'date'])
-        df['date'] = pd.to_datetime(df['date'], errors='coerce')
-        df = df.dropna(subset=['date'])
-        df['amount'] = pd.to_numeric(df['amount'], errors='coerce')
-        df = df[df['amount'] > 0]
-        
-        # Standardize text fields
-        text_columns = ['city', 'card_type', 'exp_type', 'gender']
-        for col in text_columns:
-            if col in df.columns:
-                df[col] = df[col].astype(str).str.title().str.strip()
-        
-        # Feature engineering
-        df['year'] = df['date'].dt.year
-        df['month'] = df['date'].dt.month
-        df['quarter'] = df['date'].dt.quarter
-        df['day_of_week'] = df['date'].dt.day_name()
-        df['is_weekend'] = df['date'].dt.weekday >= 5
-        df['month_name'] = df['date'].dt.month_name()
-        
-        # City tier classification
-        tier1_cities = ['Greater Mumbai, India', 'Delhi, India', 'Bengaluru, India', 'Ahmedabad, India']
-        df['city_tier'] = df['city'].apply(
-            lambda x: 'Tier-1' if x in tier1_cities else 'Tier-2/3'
-        )
-        
-        # Spending categories
-        def categorize_spending(amount):
-            if amount < 1000:
-                return 'Low (₹0-1K)'
-            elif amount < 5000:
-                return 'Medium (₹1K-5K)'
-            elif amount < 15000:
-                return 'High (₹5K-15K)'
-            else:
-                return 'Premium (₹15K+)'
-        
-        df['spending_tier'] = df['amount'].apply(categorize_spending)
-        
-        # Create category from exp_type if available
-        if 'exp_type' in df.columns:
-            df['category'] = df['exp_type']
-        
-        return df
-    except FileNotFoundError:
-        st.error("❌ Credit card dataset not found. Please ensure 'credit_card_data.csv' exists in the repository.")
-        return None
-    except Exception as e:
-        st.error(f"❌ Error loading data: {str(e)}")
-        return None
+        pq.write_table(table, tmp_path, compression='zstd',
+                       row_group_size=max(PARQUET_ROW_GROUP_BYTES // bytes_per_row, 1))
+        os.replace(tmp_path, PARQUET_PATH)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+    return PARQUET_PATH
 
-def create_sql_analysis(df):
-    """Create SQL database and run analysis queries"""
-    conn = sqlite3.connect(':memory:')
-    df.to_sql('transactions', conn, index=False, if_exists='replace')
-    
-    queries = {
-        'city_analysis': """
-        SELECT 
-            city,
-            city_tier,
-            COUNT(*) as txn_count,
-            ROUND(SUM(amount), 2) as total_spend,
-            ROUND(AVG(amount), 2) as avg_spend,
-            ROUND(SUM(amount) * 100.0 / (SELECT SUM(amount) FROM transactions), 2) as spend_percentage
-        FROM transactions
-        GROUP BY city, city_tier
-        ORDER BY total_spend DESC
-        LIMIT 15;
-        """,
-        
-        'category_performance': """
-        SELECT 
-            category,
-            COUNT(*) as transaction_count,
-            ROUND(SUM(amount), 2) as total_revenue,
-            ROUND(AVG(amount), 2) as avg_transaction_value
-        FROM transactions
-        WHERE category IS NOT NULL
-        GROUP BY category
-        ORDER BY total_revenue DESC;
-        """,
-        
-        'gender_analysis': """
-        SELECT 
-            gender,
-            city_tier,
-            COUNT(*) as txn_count,
-            ROUND(SUM(amount), 2) as total_spend,
-            ROUND(AVG(amount), 2) as avg_spend
-        FROM transactions
-        GROUP BY gender, city_tier
-        ORDER BY total_spend DESC;
-        """,
-        
-        'monthly_trends': """
-        SELECT 
-            month,
-            month_name,
-            quarter,
-            COUNT(*) as monthly_transactions,
-            ROUND(SUM(amount), 2) as monthly_spend,
-            ROUND(AVG(amount), 2) as avg_transaction
-        FROM transactions
-        GROUP BY month, month_name, quarter
-        ORDER BY month;
-        """
+@st.cache_resource
+def get_master():
+    """Load the cleaned master Arrow table once and share it across sessions"""
+    try:
+        # Dictionary-encode low-cardinality text so filters and groupings work on int codes
+        table = pq.read_table(ensure_parquet(), columns=PARQUET_COLUMNS,
+                              read_dictionary=CATEGORICAL_COLUMNS)
+    except (OSError, pa.ArrowException):
+        # Read-only checkout or unreadable Parquet file: parse the CSV directly
+        df = clean_raw_data(read_raw_csv())[PARQUET_COLUMNS]
+        df = df.astype({col: 'category' for col in CATEGORICAL_COLUMNS})
+        table = pa.Table.from_pandas(df, preserve_index=False)
+    
+    # Whole-rupee amounts are stored exactly as int32 (float32 would skew them).
+    # Polars sums Int32 as Int32 and wraps on overflow, so aggregations of
+    # amount in Polars must widen to Int64 first; pandas/NumPy widens itself.
+    if pa.types.is_integer(table['amount'].type):
+        try:
+            table = table.set_column(table.schema.get_field_index('amount'), 'amount',
+                                     table['amount'].cast(pa.int32()))
+        except pa.ArrowInvalid:
+            pass
+    
+    return table
+
+@st.cache_resource
+def load_and_process_data():
+    """Build the lazy query with engineered features over the master table once"""
+    # Errors propagate so Streamlit does not cache a failed load; main reports them
+    lf = pl.from_arrow(get_master()).lazy()
+    
+    # Feature engineering: decompose the date once, derive the rest from small ints
+    lf = lf.with_columns([
+        pl.col('date').dt.year().cast(pl.Int16).alias('year'),
+        pl.col('date').dt.month().alias('month'),
+        pl.col('date').dt.weekday().alias('weekday'),
+    ]).with_columns([
+        ((pl.col('month') - 1) // 3 + 1).alias('quarter'),
+        pl.lit(pl.Series(DAY_NAMES, dtype=pl.Enum(DAY_NAMES)))
+          .gather(pl.col('weekday') - 1)
+          .alias('day_of_week'),
+        (pl.col('weekday') >= 6).alias('is_weekend'),
+        pl.lit(pl.Series(MONTH_NAMES, dtype=pl.Enum(MONTH_NAMES)))
+          .gather(pl.col('month') - 1)
+          .alias('month_name'),
+        
+        # City tier classification (membership test on the categorical city codes)
+        pl.when(pl.col('city').is_in(TIER1_CITIES))
+          .then(pl.lit('Tier-1'))
+          .otherwise(pl.lit('Tier-2/3'))
+          .cast(pl.Enum(CITY_TIERS))
+          .alias('city_tier'),
+        
+        # Spending categories (binary search over the sorted tier edges)
+        pl.lit(pl.Series(SPENDING_TIER_LABELS, dtype=pl.Enum(SPENDING_TIER_LABELS)))
+          .gather(
+              pl.lit(pl.Series(SPENDING_TIER_EDGES, dtype=pl.Float64))
+                .search_sorted(pl.col('amount').cast(pl.Float64), side='right')
+          )
+          .alias('spending_tier'),
+        
+        # Create category from exp_type
+        pl.col('exp_type').alias('category'),
+    ]).drop('weekday')
+    
+    return lf
+
+@st.cache_resource
+def get_choices():
+    """Compute the sidebar filter choices once from the master table"""
+    # Cast categoricals to strings so the lists sort alphabetically on every
+    # Polars version (older ones sort Categoricals by code, i.e. appearance order)
+    return load_and_process_data().select([
+        pl.len().alias('rows'),
+        pl.col('date').min().alias('date_min'),
+        pl.col('date').max().alias('date_max'),
+        pl.col('city').cast(pl.String).unique().sort().implode().alias('cities'),
+        pl.col('gender').cast(pl.String).unique().sort().implode().alias('genders'),
+        pl.col('card_type').cast(pl.String).unique().sort().implode().alias('card_types'),
+    ]).collect().row(0, named=True)
+
+def get_filtered_view(filters):
+    """Collect the feature-engineered Arrow-backed frame for one set of sidebar filters"""
+    start_date, end_date, city, gender, card_type = filters
+    
+    # Build a single predicate; Polars applies it before the derived columns are computed
+    predicate = pl.lit(True)
+    if start_date is not None:
+        # Half-open bounds on the raw timestamps, so no per-row date conversion
+        lower = datetime.combine(start_date, datetime.min.time())
+        upper = datetime.combine(end_date, datetime.min.time()) + timedelta(days=1)
+        predicate &= pl.col('date').is_between(lower, upper, closed='left')
+    if city is not None:
+        predicate &= pl.col('city') == city
+    if gender is not None:
+        predicate &= pl.col('gender') == gender
+    if card_type is not None:
+        predicate &= pl.col('card_type') == card_type
+    
+    return load_and_process_data().filter(predicate).collect(engine='streaming')
+
+# Only the pandas frame is cached, and only for a few recent filter sets: these are
+# full-size copies shared by all sessions, unlike the small cached summary tables
+@st.cache_resource(max_entries=4, ttl=3600)
+def get_filtered_frame(filters):
+    """Convert a filtered view to pandas once per filter set (shared, so treat it as read-only)"""
+    # Polars maps its enum columns to pandas categoricals
+    return get_filtered_view(filters).to_pandas()
+
+def weekend_summary(df):
+    """Compare weekday and weekend spending"""
+    weekend_data = df.groupby('is_weekend')['amount'].agg(
+        Total_Spend='sum',
+        Transaction_Count='size',
+        Avg_Spend='mean'
+    ).round(2)
+    weekend_data.index = weekend_data.index.map({False: 'Weekday', True: 'Weekend'})
+    return weekend_data
+
+def create_summary_tables(df):
+    """Run the KPIs and grouped summaries behind the dashboard tabs"""
+    total_spend = df['amount'].sum()
+    
+    # Core KPIs and chart inputs; failures here should surface, not be skipped
+    results = {
+        'overview': {
+            'transactions': len(df),
+            'total_spend': total_spend,
+            'avg_spend': df['amount'].mean(),
+            'cities': df['city'].nunique(),
+            'card_types': df['card_type'].nunique(),
+            'date_min': df['date'].min(),
+            'date_max': df['date'].max(),
+        },
+        'top_categories': df.groupby('category', observed=True, sort=False).size().nlargest(5),
+        'amount_histogram': np.histogram(df['amount'].to_numpy(), bins=50),
+        'city_tier_spend': (
+            df.groupby('city_tier', observed=True, sort=False)['amount'].sum().reset_index()
+        ),
+        'weekend_data': weekend_summary(df),
+        'dow_data': (
+            df.groupby('day_of_week', observed=True, sort=False)['amount'].sum().reindex(DAY_NAMES)
+        ),
+        'top_city': df.groupby('city', observed=True, sort=False)['amount'].sum().idxmax(),
+        'best_month': df.groupby('month_name', observed=True, sort=False)['amount'].sum().idxmax(),
     }
     
-    results = {}
-    for name, query in queries.items():
+    # Detailed tables are optional: report a failure and let the tab skip the chart
+    summaries = {
+        'city_analysis': lambda: (
+            df.groupby(['city', 'city_tier'], observed=True, sort=False)
+              .agg(txn_count=('amount', 'size'),
+                   total_spend=('amount', 'sum'),
+                   avg_spend=('amount', 'mean'))
+              .assign(spend_percentage=lambda x: x['total_spend'] * 100.0 / total_spend)
+              .round(2)
+              .nlargest(15, 'total_spend')
+              .reset_index()
+        ),
+        
+        'category_performance': lambda: (
+            df.groupby('category', observed=True, sort=False)
+              .agg(transaction_count=('amount', 'size'),
+                   total_revenue=('amount', 'sum'),
+                   avg_transaction_value=('amount', 'mean'))
+              .round(2)
+              .sort_values('total_revenue', ascending=False)
+              .reset_index()
+        ),
+        
+        'gender_analysis': lambda: (
+            df.groupby(['gender', 'city_tier'], observed=True, sort=False)
+              .agg(txn_count=('amount', 'size'),
+                   total_spend=('amount', 'sum'),
+                   avg_spend=('amount', 'mean'))
+              .round(2)
+              .sort_values('total_spend', ascending=False)
+              .reset_index()
+        ),
+        
+        'monthly_trends': lambda: (
+            df.groupby(['month', 'month_name', 'quarter'], observed=True, sort=False)
+              .agg(monthly_transactions=('amount', 'size'),
+                   monthly_spend=('amount', 'sum'),
+                   avg_transaction=('amount', 'mean'))
+              .round(2)
+              .sort_values('month')
+              .reset_index()
+        )
+    }
+    
+    for name, summary in summaries.items():
         try:
-            results[name] = pd.read_sql_query(query, conn)
+            results[name] = summary()
         except Exception as e:
-            st.error(f"Query {name} failed: {e}")
+            st.error(f"Summary {name} failed: {e}")
     
-    conn.close()
     return results
 
+@st.cache_data(max_entries=32)
+def get_summary_tables(filters):
+    """Cache the small summary tables per filter set instead of re-aggregating each rerun"""
+    return create_summary_tables(get_filtered_frame(filters))
+
+def score_quintiles(values, ascending=True):
+    """Score values 1-5 by rank quintile, 5 being the largest unless ascending is False"""
+    ranks = pd.Series(values).rank(method='first').to_numpy()
+    scores = np.ceil(ranks * 5 / len(ranks)).astype(np.int8)
+    return scores if ascending else 6 - scores
+
 def create_rfm_analysis(df):
-    """Create RFM analysis using customer groups"""
+    """Create RFM analysis using customer groups from the filtered Polars frame"""
     if df is None or len(df) == 0:
         return None
     
-    # Create customer groups
-    df['customer_group'] = df['city'].astype(str) + '_' + df['gender'].astype(str) + '_' + df['card_type'].astype(str)
-    
     reference_date = df['date'].max()
     
-    rfm = df.groupby('customer_group').agg({
-        'date': lambda x: (reference_date - x.max()).days,
-        'amount': ['count', 'sum']
-    }).reset_index()
-    
-    rfm.columns = ['customer_group', 'Recency', 'Frequency', 'Monetary']
-    
-    # Calculate RFM scores
-    rfm['R_Score'] = pd.qcut(rfm['Recency'], 5, labels=[5,4,3,2,1], duplicates='drop')
-    rfm['F_Score'] = pd.qcut(rfm['Frequency'].rank(method='first'), 5, labels=[1,2,3,4,5], duplicates='drop')
-    rfm['M_Score'] = pd.qcut(rfm['Monetary'], 5, labels=[1,2,3,4,5], duplicates='drop')
-    
-    # Convert to int
-    rfm['R_Score'] = rfm['R_Score'].astype(int)
-    rfm['F_Score'] = rfm['F_Score'].astype(int)
-    rfm['M_Score'] = rfm['M_Score'].astype(int)
-    
-    # Segmentation
-    def segment_groups(row):
-        if row['R_Score'] >= 4 and row['F_Score'] >= 4 and row['M_Score'] >= 4:
-            return 'Champions'
-        elif row['R_Score'] >= 3 and row['F_Score'] >= 3:
-            return 'Loyal Groups'
-        elif row['R_Score'] <= 2 and row['F_Score'] >= 3:
-            return 'At Risk'
-        elif row['R_Score'] <= 2 and row['F_Score'] <= 2:
-            return 'Lost Groups'
-        else:
-            return 'Potential Loyalists'
-    
-    rfm['Segment'] = rfm.apply(segment_groups, axis=1)
+    # Group on the categorical codes; the readable customer_group label is only
+    # built for the aggregated rows, not for every transaction
+    rfm = (
+        df.group_by(['city', 'gender', 'card_type'])
+        .agg([
+            pl.col('date').max().alias('last_date'),
+            pl.len().alias('Frequency'),
+            pl.col('amount').cast(pl.Int64).sum().alias('Monetary'),
+        ])
+        .with_columns([
+            pl.concat_str(['city', 'gender', 'card_type'], separator='_').alias('customer_group'),
+            (pl.lit(reference_date) - pl.col('last_date')).dt.total_days().alias('Recency'),
+        ])
+        .select(['customer_group', 'Recency', 'Frequency', 'Monetary'])
+        .sort('customer_group')
+        .to_pandas()
+    )
+    
+    # Calculate RFM scores (Recency: most recent groups score highest)
+    rfm['R_Score'] = score_quintiles(rfm['Recency'], ascending=False)
+    rfm['F_Score'] = score_quintiles(rfm['Frequency'])
+    rfm['M_Score'] = score_quintiles(rfm['Monetary'])
+    
+    # Segmentation (first matching rule wins), as int8 codes into SEGMENTS
+    r = rfm['R_Score'].to_numpy()
+    f = rfm['F_Score'].to_numpy()
+    m = rfm['M_Score'].to_numpy()
+    codes = np.select(
+        [
+            (r >= 4) & (f >= 4) & (m >= 4),
+            (r >= 3) & (f >= 3),
+            (r <= 2) & (f >= 3),
+            (r <= 2) & (f <= 2),
+        ],
+        [0, 1, 2, 3],
+        default=4
+    ).astype(np.int8)
+    rfm['Segment'] = pd.Categorical.from_codes(codes, SEGMENTS)
     return rfm
 
+@st.cache_data(max_entries=32)
+def get_rfm_analysis(filters):
+    """Cache the RFM table per filter set"""
+    return create_rfm_analysis(get_filtered_view(filters))
+
 # Main App
 def main():
     st.markdown('<h1 class="main-header">💳 Credit Card Spending Analytics Dashboard</h1>', unsafe_allow_html=True)
@@ -230,9 +395,17 @@ def main():
     
     # Load and process data automatically
     with st.spinner("🔄 Loading credit card dataset..."):
-        df = load_and_process_data()
+        try:
+            load_and_process_data()
+            data_loaded = True
+        except FileNotFoundError:
+            st.error("❌ Credit card dataset not found. Please ensure 'credit_card_data.csv' exists in the repository.")
+            data_loaded = False
+        except Exception as e:
+            st.error(f"❌ Error loading data: {str(e)}")
+            data_loaded = False
     
-    if df is None:
+    if not data_loaded:
         st.error("❌ Unable to load the dataset. Please check if 'credit_card_data.csv' exists in the repository.")
         st.markdown("""
         ### Expected CSV Format:
@@ -249,10 +422,13 @@ def main():
     # Add sidebar filters after data is loaded
     st.sidebar.markdown("---")
     
+    # Filter choices are computed once from the full dataset
+    choices = get_choices()
+    
     # Date range filter
-    if not df.empty:
-        date_min = df['date'].min().date()
-        date_max = df['date'].max().date()
+    if choices['rows'] > 0:
+        date_min = choices['date_min'].date()
+        date_max = choices['date_max'].date()
         
         date_range = st.sidebar.date_input(
             "📅 Select Date Range",
@@ -262,44 +438,49 @@ def main():
         )
         
         # City filter
-        cities = ['All Cities'] + sorted(df['city'].unique().tolist())
+        cities = ['All Cities'] + choices['cities']
         selected_city = st.sidebar.selectbox("🏙️ Select City", cities)
         
         # Gender filter  
-        genders = ['All Genders'] + sorted(df['gender'].unique().tolist())
+        genders = ['All Genders'] + choices['genders']
         selected_gender = st.sidebar.selectbox("👤 Select Gender", genders)
         
         # Card type filter
-        card_types = ['All Card Types'] + sorted(df['card_type'].unique().tolist())
+        card_types = ['All Card Types'] + choices['card_types']
         selected_card_type = st.sidebar.selectbox("💳 Select Card Type", card_types)
         
-        # Apply filters
-        filtered_df = df.copy()
-        
         # Date filter
+        start_date = end_date = None
         if len(date_range) == 2:
             start_date, end_date = date_range
-            filtered_df = filtered_df[
-                (filtered_df['date'].dt.date >= start_date) & 
-                (filtered_df['date'].dt.date <= end_date)
-            ]
-        
-        # Other filters
-        if selected_city != 'All Cities':
-            filtered_df = filtered_df[filtered_df['city'] == selected_city]
-        if selected_gender != 'All Genders':
-            filtered_df = filtered_df[filtered_df['gender'] == selected_gender]
-        if selected_card_type != 'All Card Types':
-            filtered_df = filtered_df[filtered_df['card_type'] == selected_card_type]
         
-        # Update df to filtered version
-        df = filtered_df
-        
-        # Show filter summary
-        st.sidebar.markdown("---")
-        st.sidebar.markdown("### 📊 Filtered Data Summary")
-        st.sidebar.metric("Transactions", f"{len(df):,}")
-        st.sidebar.metric("Total Value", f"₹{df['amount'].sum():,.0f}")
+        # Filtered views are memoized per filter combination
+        filters = (
+            start_date,
+            end_date,
+            selected_city if selected_city != 'All Cities' else None,
+            selected_gender if selected_gender != 'All Genders' else None,
+            selected_card_type if selected_card_type != 'All Card Types' else None,
+        )
+    else:
+        filters = (None, None, None, None, None)
+    
+    # The filtered frame is memoized per filter set, so reruns with unchanged filters copy nothing
+    df = get_filtered_frame(filters)
+    
+    if df.empty:
+        st.warning("⚠️ No transactions match the selected filters. Try widening the date range or clearing a filter.")
+        return
+    
+    # KPIs and grouped summaries are cached per filter set
+    summary_results = get_summary_tables(filters)
+    overview = summary_results['overview']
+    
+    # Show filter summary
+    st.sidebar.markdown("---")
+    st.sidebar.markdown("### 📊 Filtered Data Summary")
+    st.sidebar.metric("Transactions", f"{overview['transactions']:,}")
+    st.sidebar.metric("Total Value", f"₹{overview['total_spend']:,.0f}")
     
     # Dataset overview
     st.success(f"✅ Dataset loaded successfully! Shape: {df.shape}")
@@ -308,13 +489,13 @@ def main():
     col1, col2, col3, col4 = st.columns(4)
     
     with col1:
-        st.metric("Total Revenue", f"₹{df['amount'].sum():,.0f}")
+        st.metric("Total Revenue", f"₹{overview['total_spend']:,.0f}")
     with col2:
-        st.metric("Total Transactions", f"{len(df):,}")
+        st.metric("Total Transactions", f"{overview['transactions']:,}")
     with col3:
-        st.metric("Average Transaction", f"₹{df['amount'].mean():.0f}")
+        st.metric("Average Transaction", f"₹{overview['avg_spend']:.0f}")
     with col4:
-        st.metric("Cities Covered", f"{df['city'].nunique()}")
+        st.metric("Cities Covered", f"{overview['cities']}")
     
     # Tabs for different analyses
     tab1, tab2, tab3, tab4, tab5 = st.tabs(["📊 Overview", "🏙️ Geographic", "📈 Trends", "👥 Customer Segmentation", "💡 Insights"])
@@ -326,35 +507,33 @@ def main():
         
         with col1:
             st.write("**Data Summary:**")
-            st.write(f"- Date Range: {df['date'].min().date()} to {df['date'].max().date()}")
-            st.write(f"- Number of Cities: {df['city'].nunique()}")
-            st.write(f"- Card Types: {df['card_type'].nunique() if 'card_type' in df.columns else 'N/A'}")
+            st.write(f"- Date Range: {overview['date_min'].date()} to {overview['date_max'].date()}")
+            st.write(f"- Number of Cities: {overview['cities']}")
+            st.write(f"- Card Types: {overview['card_types']}")
             
             # Top categories
-            if 'category' in df.columns:
-                st.write("**Top Expense Categories:**")
-                top_categories = df['category'].value_counts().head()
-                for cat, count in top_categories.items():
-                    st.write(f"- {cat}: {count:,} transactions")
+            st.write("**Top Expense Categories:**")
+            top_categories = summary_results['top_categories']
+            for cat, count in top_categories.items():
+                st.write(f"- {cat}: {count:,} transactions")
         
         with col2:
-            # Amount distribution
-            fig = px.histogram(df, x='amount', nbins=50, title='Transaction Amount Distribution')
-            fig.update_layout(height=400)
+            # Amount distribution, binned server-side so only 50 bars reach the browser
+            counts, edges = summary_results['amount_histogram']
+            fig = go.Figure(go.Bar(x=(edges[:-1] + edges[1:]) / 2, y=counts, width=np.diff(edges)))
+            fig.update_layout(title='Transaction Amount Distribution', height=400, bargap=0,
+                              xaxis_title='amount', yaxis_title='count')
             st.plotly_chart(fig, use_container_width=True)
     
     with tab2:
         st.subheader("🏙️ Geographic Analysis")
         
-        # SQL Analysis
-        sql_results = create_sql_analysis(df)
-        
         col1, col2 = st.columns(2)
         
         with col1:
-            if 'city_analysis' in sql_results:
+            if 'city_analysis' in summary_results:
                 st.write("**Top Cities by Revenue:**")
-                city_data = sql_results['city_analysis'].head(10)
+                city_data = summary_results['city_analysis'].head(10)
                 fig = px.bar(city_data, x='city', y='total_spend', 
                            title='Top 10 Cities by Revenue',
                            color='city_tier')
@@ -363,15 +542,15 @@ def main():
         
         with col2:
             # City tier distribution
-            city_tier_spend = df.groupby('city_tier')['amount'].sum().reset_index()
+            city_tier_spend = summary_results['city_tier_spend']
             fig = px.pie(city_tier_spend, values='amount', names='city_tier', 
                         title='Revenue Distribution by City Tier')
             st.plotly_chart(fig, use_container_width=True)
         
         # Gender analysis
-        if 'gender_analysis' in sql_results:
+        if 'gender_analysis' in summary_results:
             st.write("**Gender & Location Analysis:**")
-            gender_data = sql_results['gender_analysis']
+            gender_data = summary_results['gender_analysis']
             fig = px.bar(gender_data, x='gender', y='total_spend', 
                         color='city_tier', barmode='group',
                         title='Spending by Gender & City Tier')
@@ -380,8 +559,8 @@ def main():
     with tab3:
         st.subheader("📈 Spending Trends")
         
-        if 'monthly_trends' in sql_results:
-            monthly_data = sql_results['monthly_trends']
+        if 'monthly_trends' in summary_results:
+            monthly_data = summary_results['monthly_trends']
             
             col1, col2 = st.columns(2)
             
@@ -400,11 +579,7 @@ def main():
                 st.plotly_chart(fig, use_container_width=True)
         
         # Weekend vs Weekday analysis
-        weekend_data = df.groupby('is_weekend').agg({
-            'amount': ['sum', 'count', 'mean']
-        }).round(2)
-        weekend_data.columns = ['Total_Spend', 'Transaction_Count', 'Avg_Spend']
-        weekend_data.index = ['Weekday', 'Weekend']
+        weekend_data = summary_results['weekend_data']
         
         col1, col2 = st.columns(2)
         
@@ -415,9 +590,7 @@ def main():
         
         with col2:
             # Day of week pattern
-            dow_data = df.groupby('day_of_week')['amount'].sum().reindex([
-                'Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday'
-            ])
+            dow_data = summary_results['dow_data']
             fig = px.bar(x=dow_data.index, y=dow_data.values,
                         title='Spending by Day of Week')
             fig.update_xaxes(tickangle=45)
@@ -426,43 +599,44 @@ def main():
     with tab4:
         st.subheader("👥 Customer Segmentation (RFM Analysis)")
         
-        rfm_results = create_rfm_analysis(df)
+        rfm_results = get_rfm_analysis(filters)
         
         if rfm_results is not None:
+            # One grouped pass feeds both charts and the summary table; sorting
+            # five category codes keeps the segments in rule order
+            segment_summary = rfm_results.groupby('Segment', observed=True).agg(
+                Count=('customer_group', 'count'),
+                Avg_Monetary=('Monetary', 'mean'),
+                Avg_Frequency=('Frequency', 'mean'),
+                Avg_Recency=('Recency', 'mean')
+            ).round(2)
+            
             col1, col2 = st.columns(2)
             
             with col1:
                 # Segment distribution
-                segment_counts = rfm_results['Segment'].value_counts()
-                fig = px.pie(values=segment_counts.values, names=segment_counts.index,
+                fig = px.pie(values=segment_summary['Count'], names=segment_summary.index,
                            title='Customer Group Segments')
                 st.plotly_chart(fig, use_container_width=True)
             
             with col2:
                 # Segment value
-                segment_value = rfm_results.groupby('Segment')['Monetary'].mean().reset_index()
-                fig = px.bar(segment_value, x='Segment', y='Monetary',
+                fig = px.bar(segment_summary.reset_index(), x='Segment', y='Avg_Monetary',
+                           labels={'Avg_Monetary': 'Monetary'},
                            title='Average Monetary Value by Segment')
                 fig.update_xaxes(tickangle=45)
                 st.plotly_chart(fig, use_container_width=True)
             
             st.write("**Segment Summary:**")
-            segment_summary = rfm_results.groupby('Segment').agg({
-                'customer_group': 'count',
-                'Monetary': 'mean',
-                'Frequency': 'mean',
-                'Recency': 'mean'
-            }).round(2)
-            segment_summary.columns = ['Count', 'Avg_Monetary', 'Avg_Frequency', 'Avg_Recency']
             st.dataframe(segment_summary)
     
     with tab5:
         st.subheader("💡 Business Insights & Recommendations")
         
-        # Key insights
-        total_revenue = df['amount'].sum()
-        top_city = df.groupby('city')['amount'].sum().idxmax()
-        best_month = df.groupby('month_name')['amount'].sum().idxmax()
+        # Key insights (top city and peak month come from the cached summaries)
+        total_revenue = overview['total_spend']
+        top_city = summary_results['top_city']
+        best_month = summary_results['best_month']
         
         st.markdown(f"""
         <div class="insight-box">
@@ -470,8 +644,8 @@ def main():
         <ul>
         <li><strong>Top Performing City:</strong> {top_city} generates the highest revenue</li>
         <li><strong>Peak Season:</strong> {best_month} shows highest spending activity</li>
-        <li><strong>Total Market Size:</strong> ₹{total_revenue:,.0f} across {df['city'].nunique()} cities</li>
-        <li><strong>Transaction Pattern:</strong> {len(df):,} transactions with ₹{df['amount'].mean():.0f} average ticket size</li>
+        <li><strong>Total Market Size:</strong> ₹{total_revenue:,.0f} across {overview['cities']} cities</li>
+        <li><strong>Transaction Pattern:</strong> {overview['transactions']:,} transactions with ₹{overview['avg_spend']:.0f} average ticket size</li>
         </ul>
         </div>
         """, unsafe_allow_html=True)
@@ -495,8 +669,8 @@ def main():
             # Create summary dataframe
             summary_data = {
                 'Metric': ['Total Revenue', 'Total Transactions', 'Average Transaction', 'Cities Covered', 'Top City', 'Peak Month'],
-                'Value': [f"₹{total_revenue:,.0f}", f"{len(df):,}", f"₹{df['amount'].mean():.0f}", 
-                         f"{df['city'].nunique()}", top_city, best_month]
+                'Value': [f"₹{total_revenue:,.0f}", f"{overview['transactions']:,}", f"₹{overview['avg_spend']:.0f}", 
+                         f"{overview['cities']}", top_city, best_month]
             }
             summary_df = pd.DataFrame(summary_data)
             